@@ -6,7 +6,10 @@ This script shows how to use the investigative suite programmatically
 rather than through the command-line interface.
 """
 
+import argparse
 import logging
+import shutil
+import tempfile
 from pathlib import Path
 from src.db import InvestigationDB
 from src.librarian import ingest_documents, detect_duplicates
@@ -18,8 +21,13 @@ logging.basicConfig(
     format='%(levelname)s: %(message)s'
 )
 
-def main():
-    """Example demonstrating the investigative suite."""
+def run_example(test_dir: Path):
+    """
+    Example demonstrating the investigative suite.
+    
+    Args:
+        test_dir: Empty directory for the sample document and database
+    """
     
     print("=" * 80)
     print("Investigative Suite - Example Usage")
@@ -27,9 +35,6 @@ def main():
     print()
     
     # 1. Create a sample document for testing
-    test_dir = Path("/tmp/example_investigation")
-    test_dir.mkdir(exist_ok=True)
-    
     sample_doc = test_dir / "example.txt"
     sample_doc.write_text("""
     Investigation Report - Case #12345
@@ -42,18 +47,20 @@ def main():
     Total amount discussed: $1,500,000 USD.
     """)
     
-    print(f"Created sample document: {sample_doc}")
+    print(f"Created sample document: {sample_doc.name}")
     print()
     
     # 2. Initialize database
     db_path = test_dir / "example.db"
-    print(f"Initializing database: {db_path}")
+    print(f"Initializing database: {db_path.name}")
     db = InvestigationDB(str(db_path))
     print()
     
     # 3. Ingest documents
     print("Ingesting documents...")
-    documents = ingest_documents(str(test_dir), extensions=['.txt'])
+    # Hash with the database's algorithm so the hashes match the stored ones
+    documents = ingest_documents(str(test_dir), extensions=['.txt'],
+                                 hash_algorithm=db.hash_algorithm)
     print(f"Found {len(documents)} document(s)")
     print()
     
@@ -65,46 +72,46 @@ def main():
     
     # 5. Process documents
     print("Processing documents and extracting entities...")
-    for filename, text, file_hash in unique_docs:
-        # Insert document
-        doc_id = db.insert_document(filename, text, file_hash)
-        
-        if doc_id:
-            # Extract entities
-            entities = extract_entities(text)
-            
-            print(f"\nDocument: {Path(filename).name}")
-            print(f"  People found: {len(entities['PERSON'])}")
-            print(f"  Money amounts: {len(entities['MONEY'])}")
-            print(f"  Dates found: {len(entities['DATE'])}")
-            
-            # Display extracted entities
-            if entities['PERSON']:
-                print("\n  People:")
-                for person, context in entities['PERSON'][:5]:  # Show first 5
-                    print(f"    - {person}")
-            
-            if entities['MONEY']:
-                print("\n  Money:")
-                for amount, context in entities['MONEY'][:5]:
-                    print(f"    - {amount}")
+    # All inserts are committed together when the block ends
+    with db.transaction():
+        for filename, text, file_hash in unique_docs:
+            # Insert document
+            doc_id = db.insert_document(filename, text, file_hash)
             
-            if entities['DATE']:
-                print("\n  Dates:")
-                for date, context in entities['DATE'][:5]:
-                    print(f"    - {date}")
-            
-            # Store entities
-            for entity_type, entity_list in entities.items():
-                for value, context in entity_list:
-                    db.insert_entity(doc_id, entity_type, value, context)
-            
-            # Find relationships
-            relationships = find_relationships(text, entities)
-            if relationships:
-                print(f"\n  Relationships found: {len(relationships)}")
-                for rel in relationships[:3]:  # Show first 3
-                    print(f"    - {rel['person1']} ↔ {rel['person2']} (distance: {rel['distance']} chars)")
+            if doc_id:
+                # Extract entities
+                entities = extract_entities(text)
+                
+                print(f"\nDocument: {Path(filename).name}")
+                print(f"  People found: {len(entities['PERSON'])}")
+                print(f"  Money amounts: {len(entities['MONEY'])}")
+                print(f"  Dates found: {len(entities['DATE'])}")
+                
+                # Display extracted entities
+                if entities['PERSON']:
+                    print("\n  People:")
+                    for person, context in entities['PERSON'][:5]:  # Show first 5
+                        print(f"    - {person}")
+                
+                if entities['MONEY']:
+                    print("\n  Money:")
+                    for amount, context in entities['MONEY'][:5]:
+                        print(f"    - {amount}")
+                
+                if entities['DATE']:
+                    print("\n  Dates:")
+                    for date, context in entities['DATE'][:5]:
+                        print(f"    - {date}")
+                
+                # Store entities (one executemany per document)
+                db.insert_entities(doc_id, entities)
+                
+                # Find relationships
+                relationships = find_relationships(text, entities)
+                if relationships:
+                    print(f"\n  Relationships found: {len(relationships)}")
+                    for rel in relationships[:3]:  # Show first 3
+                        print(f"    - {rel['person1']} ↔ {rel['person2']} (distance: {rel['distance']} chars)")
     
     print()
     
@@ -125,9 +132,30 @@ def main():
     print()
     print("=" * 80)
     print("Example completed successfully!")
-    print(f"Database saved to: {db_path}")
     print("=" * 80)
 
 
+def main():
+    """Run the example in a fresh temporary directory."""
+    parser = argparse.ArgumentParser(description='Investigative Suite - Example Usage')
+    parser.add_argument(
+        '--keep',
+        action='store_true',
+        help='Keep the sample document and database instead of deleting them'
+    )
+    args = parser.parse_args()
+    
+    # A fresh directory per run, so documents and the database from an earlier run
+    # are never picked up again
+    test_dir = Path(tempfile.mkdtemp(prefix="example_investigation_"))
+    try:
+        run_example(test_dir)
+    finally:
+        if args.keep:
+            print(f"Sample document and database kept in: {test_dir}")
+        else:
+            shutil.rmtree(test_dir, ignore_errors=True)
+
+
 if __name__ == '__main__':
     main()
@@ -15,12 +15,16 @@ Example:
 
 import argparse
 import logging
+import os
 import sys
+from itertools import islice
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
-from src.librarian import ingest_documents, detect_duplicates
-from src.detective import extract_entities, find_relationships
+from src.librarian import (
+    AVAILABLE_HASH_ALGORITHMS, HASH_PREFIXES, detect_duplicates, ingest_documents,
+)
+from src.detective import extract_entities_batch, find_relationships
 from src.db import InvestigationDB
 
 # Configuration constants
@@ -28,6 +32,7 @@ DEFAULT_DATA_DIRECTORY = 'data/processed/files'
 DEFAULT_DATABASE_PATH = 'investigation.db'
 DEFAULT_LOG_PATH = 'investigation.log'
 DEFAULT_FILE_EXTENSIONS = ['.txt', '.pdf', '.jpg', '.jpeg', '.png']
+DB_COMMIT_BATCH_SIZE = 100  # Documents (with their entities) committed per transaction
 
 
 def setup_logging(log_file: str = DEFAULT_LOG_PATH, verbose: bool = False):
@@ -49,7 +54,8 @@ def setup_logging(log_file: str = DEFAULT_LOG_PATH, verbose: bool = False):
     )
     
     # File handler
-    file_handler = logging.FileHandler(log_file, mode='a')
+    # Explicit encoding: filenames and OCR'd text in messages are not always ASCII
+    file_handler = logging.FileHandler(log_file, mode='a', encoding='utf-8')
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(file_formatter)
     
@@ -69,7 +75,8 @@ def setup_logging(log_file: str = DEFAULT_LOG_PATH, verbose: bool = False):
     logging.info("=" * 80)
 
 
-def process_documents(directory: str, extensions: List[str], db: InvestigationDB):
+def process_documents(directory: str, extensions: List[str], db: InvestigationDB,
+                      workers: Optional[int] = None):
     """
     Process documents from directory and store in database.
     
@@ -77,15 +84,26 @@ def process_documents(directory: str, extensions: List[str], db: InvestigationDB
         directory: Directory to scan
         extensions: File extensions to process
         db: Database connection
+        workers: Number of worker processes for OCR and entity extraction (default: CPU count)
     """
     logger = logging.getLogger(__name__)
     
     logger.info(f"Scanning directory: {directory}")
     logger.info(f"Looking for extensions: {', '.join(extensions)}")
     
-    # Ingest documents
+    # Ingest documents, without re-extracting files already in the database
     try:
-        documents = ingest_documents(directory, extensions)
+        if db.hash_algorithm not in AVAILABLE_HASH_ALGORITHMS:
+            # Hashing with anything else would make every stored document look new
+            logger.error(f"Hash algorithm '{db.hash_algorithm}' is not available; "
+                         f"install the {db.hash_algorithm} package to process documents "
+                         f"for this database")
+            return
+        
+        known_hashes = db.get_document_hashes()
+        documents = ingest_documents(directory, extensions, workers=workers,
+                                     known_hashes=known_hashes,
+                                     hash_algorithm=db.hash_algorithm)
         
         if not documents:
             logger.warning("No documents found to process")
@@ -104,46 +122,49 @@ def process_documents(directory: str, extensions: List[str], db: InvestigationDB
         skipped_count = 0
         error_count = 0
         
+        new_docs = []
         for filename, text, file_hash in unique_docs:
-            try:
-                # Check if document already exists
-                if db.document_exists(file_hash):
-                    logger.debug(f"Document already in database: {filename}")
-                    skipped_count += 1
-                    continue
-                
-                # Insert document
-                doc_id = db.insert_document(filename, text, file_hash)
-                
-                if doc_id is None:
-                    logger.warning(f"Failed to insert document: {filename}")
-                    error_count += 1
-                    continue
-                
-                # Extract entities
-                entities = extract_entities(text)
-                
-                # Store entities
-                entity_count = 0
-                for entity_type, entity_list in entities.items():
-                    for value, context in entity_list:
-                        entity_id = db.insert_entity(doc_id, entity_type, value, context)
-                        if entity_id:
-                            entity_count += 1
-                
-                logger.info(f"Processed: {Path(filename).name} ({entity_count} entities)")
-                processed_count += 1
-                
-                # Find relationships (optional - can be slow for large texts)
-                if entity_count > 1:
-                    relationships = find_relationships(text, entities)
-                    if relationships:
-                        logger.debug(f"Found {len(relationships)} relationships in {Path(filename).name}")
-                
-            except Exception as e:
-                logger.error(f"Error processing document {filename}: {e}", exc_info=True)
-                error_count += 1
+            # Check if document already exists
+            if file_hash in known_hashes:
+                logger.debug(f"Document already in database: {filename}")
+                skipped_count += 1
                 continue
+            new_docs.append((filename, text, file_hash))
+        
+        # Entities are extracted for all new documents in one stream, and stored in
+        # batches of DB_COMMIT_BATCH_SIZE documents per transaction: far fewer commits
+        # than one per document, while an interrupted run keeps the batches already done
+        texts = [text for _, text, _ in new_docs]
+        n_process = workers or os.cpu_count() or 1
+        results = zip(new_docs, extract_entities_batch(texts, n_process=n_process))
+        for batch in iter(lambda: list(islice(results, DB_COMMIT_BATCH_SIZE)), []):
+            with db.transaction():
+                for (filename, text, file_hash), entities in batch:
+                    try:
+                        # Insert document
+                        doc_id = db.insert_document(filename, text, file_hash)
+                        
+                        if doc_id is None:
+                            logger.warning(f"Failed to insert document: {filename}")
+                            error_count += 1
+                            continue
+                        
+                        # Store entities
+                        entity_count = db.insert_entities(doc_id, entities)
+                        
+                        logger.info(f"Processed: {Path(filename).name} ({entity_count} entities)")
+                        processed_count += 1
+                        
+                        # Find relationships (optional - can be slow for large texts)
+                        if entity_count > 1:
+                            relationships = find_relationships(text, entities)
+                            if relationships:
+                                logger.debug(f"Found {len(relationships)} relationships in {Path(filename).name}")
+                    
+                    except Exception as e:
+                        logger.error(f"Error processing document {filename}: {e}", exc_info=True)
+                        error_count += 1
+                        continue
         
         # Summary
         logger.info("=" * 80)
@@ -227,6 +248,22 @@ Examples:
         help=f'Path to log file (default: {DEFAULT_LOG_PATH})'
     )
     
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Number of worker processes for text and entity extraction (default: CPU count, 1 disables parallelism)'
+    )
+    
+    parser.add_argument(
+        '--hash-algorithm',
+        choices=sorted(HASH_PREFIXES),
+        default=None,
+        help='Content hash for a new database (default: sha256; blake2b is faster on CPUs '
+             'without SHA extensions, blake3 requires the blake3 package). '
+             'Existing databases keep their algorithm'
+    )
+    
     parser.add_argument(
         '--verbose',
         action='store_true',
@@ -248,7 +285,7 @@ Examples:
     try:
         # Initialize database
         logger.info(f"Opening database: {args.db}")
-        db = InvestigationDB(args.db)
+        db = InvestigationDB(args.db, hash_algorithm=args.hash_algorithm)
         
         if args.stats_only:
             # Just print statistics
@@ -260,7 +297,7 @@ Examples:
                 sys.exit(1)
             
             # Process documents
-            process_documents(args.directory, args.extensions, db)
+            process_documents(args.directory, args.extensions, db, args.workers)
             
             # Print statistics
             print_statistics(db)
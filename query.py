@@ -39,10 +39,14 @@ def list_documents(conn: sqlite3.Connection, limit: int = 10):
     print(f"{'ID':<5} {'Filename':<50} {'Size':<10} {'Hash':<15} {'Created':<20}")
     print("-" * 100)
     
-    for row in cursor.fetchall():
-        doc_id, filename, text_len, hash_prefix, created_at = row
-        filename_short = Path(filename).name[:45] + "..." if len(Path(filename).name) > 45 else Path(filename).name
-        print(f"{doc_id:<5} {filename_short:<50} {text_len:<10} {hash_prefix:<15} {created_at:<20}")
+    # Format all rows first and print them in one write
+    lines = []
+    for doc_id, filename, text_len, hash_prefix, created_at in cursor.fetchall():
+        name = Path(filename).name
+        filename_short = name[:45] + "..." if len(name) > 45 else name
+        lines.append(f"{doc_id:<5} {filename_short:<50} {text_len:<10} {hash_prefix:<15} {created_at:<20}")
+    if lines:
+        print("\n".join(lines))
     
     cursor.execute("SELECT COUNT(*) FROM documents")
     total = cursor.fetchone()[0]
@@ -59,7 +63,6 @@ def list_entities_by_type(conn: sqlite3.Connection, entity_type: str = None, lim
         cursor.execute("""
             SELECT e.entity_type, e.value, COUNT(*) as count
             FROM entities e
-            JOIN documents d ON e.doc_id = d.id
             WHERE e.entity_type = ?
             GROUP BY e.value
             ORDER BY count DESC
@@ -83,10 +86,12 @@ def list_entities_by_type(conn: sqlite3.Connection, entity_type: str = None, lim
     print(f"{'Type':<10} {'Value':<40} {'Count':<10}")
     print("-" * 100)
     
-    for row in cursor.fetchall():
-        entity_type_val, value, count = row[:3]
+    lines = []
+    for entity_type_val, value, count in cursor.fetchall():
         value_short = value[:37] + "..." if len(value) > 40 else value
-        print(f"{entity_type_val:<10} {value_short:<40} {count:<10}")
+        lines.append(f"{entity_type_val:<10} {value_short:<40} {count:<10}")
+    if lines:
+        print("\n".join(lines))
     
     print()
 
@@ -114,12 +119,14 @@ def search_entities(conn: sqlite3.Connection, search_term: str):
         print()
         return
     
+    lines = []
     for entity_type, value, context, filename in results:
-        print(f"\n{entity_type}: {value}")
-        print(f"  Document: {Path(filename).name}")
+        lines.append(f"\n{entity_type}: {value}")
+        lines.append(f"  Document: {Path(filename).name}")
         if context:
             context_clean = context.replace('\n', ' ')[:100]
-            print(f"  Context: ...{context_clean}...")
+            lines.append(f"  Context: ...{context_clean}...")
+    print("\n".join(lines))
     
     print()
 
@@ -132,10 +139,6 @@ def show_statistics(conn: sqlite3.Connection):
     cursor.execute("SELECT COUNT(*) FROM documents")
     doc_count = cursor.fetchone()[0]
     
-    # Entity count
-    cursor.execute("SELECT COUNT(*) FROM entities")
-    entity_count = cursor.fetchone()[0]
-    
     # Entities by type
     cursor.execute("""
         SELECT entity_type, COUNT(*) 
@@ -144,6 +147,7 @@ def show_statistics(conn: sqlite3.Connection):
         ORDER BY COUNT(*) DESC
     """)
     entity_types = cursor.fetchall()
+    entity_count = sum(count for _, count in entity_types)
     
     # Most common entities
     cursor.execute("""
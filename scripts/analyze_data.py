@@ -8,10 +8,39 @@ This script helps understand the relationship between:
 """
 
 import csv
+import os
+import re
 import sys
 from pathlib import Path
 from collections import defaultdict
 
+# Base name of a CATEGORY-SOURCE-BASENAME filename stem
+FILENAME_BASENAME_RE = re.compile(r'[^-]*-[^-]*-(.*)', re.DOTALL)
+
+
+def iter_files(root, suffix):
+    """
+    Recursively yield (directory, filename) for files ending in suffix.
+    
+    Unreadable directories are reported and skipped.
+    
+    Args:
+        root: Directory to walk
+        suffix: Filename suffix to match, e.g. '.txt'
+    """
+    stack = [str(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(suffix) and entry.is_file():
+                        yield directory, entry.name
+        except OSError as e:
+            print(f"Warning: cannot scan directory {directory}: {e}")
+
 
 def analyze_data():
     """Analyze and compare data from both sources."""
@@ -38,10 +67,8 @@ def analyze_data():
         # Analyze by category
         categories = defaultdict(int)
         for filename in text_files:
-            parts = filename.split('-')
-            if len(parts) >= 1:
-                category = parts[0]
-                categories[category] += 1
+            category = filename.partition('-')[0]
+            categories[category] += 1
         
         print(f"   Categories:")
         for cat, count in sorted(categories.items()):
@@ -55,7 +82,7 @@ def analyze_data():
     print(f"\n2. Organized Text Files: {processed_path}")
     
     if processed_path.exists():
-        processed_count = sum(1 for _ in processed_path.rglob('*.txt'))
+        processed_count = sum(1 for _ in iter_files(processed_path, '.txt'))
         print(f"   Total organized files: {processed_count}")
     else:
         print(f"   ✗ Not found. Run: python3 scripts/organize_data.py")
@@ -68,10 +95,10 @@ def analyze_data():
     
     # Check both possible locations
     if gdrive_path.exists():
-        image_files = list(gdrive_path.rglob('*.jpg'))
+        image_files = list(iter_files(gdrive_path, '.jpg'))
         print(f"   Total image files: {len(image_files)}")
     elif gdrive_alt_path.exists():
-        image_files = list(gdrive_alt_path.rglob('*.jpg'))
+        image_files = list(iter_files(gdrive_alt_path, '.jpg'))
         print(f"   Found in alternative location: {gdrive_alt_path}")
         print(f"   Total image files: {len(image_files)}")
         print(f"   💡 Tip: Reorganize by moving to {gdrive_path}")
@@ -83,8 +110,8 @@ def analyze_data():
         
         # Organize by source
         by_source = defaultdict(int)
-        for img in image_files:
-            source = img.parent.name
+        for directory, _ in image_files:
+            source = os.path.basename(directory)
             by_source[source] += 1
         
         print(f"   By source:")
@@ -100,15 +127,14 @@ def analyze_data():
             for filename in text_files:
                 # Remove extension and prefix to get base name
                 # e.g., "IMAGES-001-HOUSE_OVERSIGHT_010477.txt" -> "HOUSE_OVERSIGHT_010477"
-                parts = filename.rsplit('.', 1)[0].split('-')
-                if len(parts) >= 3:
-                    basename = '-'.join(parts[2:])
-                    text_basenames.add(basename)
+                match = FILENAME_BASENAME_RE.match(filename.rsplit('.', 1)[0])
+                if match:
+                    text_basenames.add(match.group(1))
             
             # Extract base names from image files
             image_basenames = set()
-            for img in image_files:
-                basename = img.stem  # filename without extension
+            for _, name in image_files:
+                basename = os.path.splitext(name)[0]  # filename without extension
                 image_basenames.add(basename)
             
             # Find matches
@@ -6,6 +6,7 @@ This script downloads the EPS_FILES_20K_NOV2025.csv file from the
 tensonaut/EPSTEIN_FILES_20K dataset on Hugging Face.
 """
 
+import argparse
 import os
 import sys
 import urllib.request
@@ -40,6 +41,20 @@ def download_with_progress(url, output_path):
 
 def main():
     """Main function to download the dataset."""
+    parser = argparse.ArgumentParser(description='Download the Epstein Files dataset')
+    existing = parser.add_mutually_exclusive_group()
+    existing.add_argument(
+        '--force',
+        action='store_true',
+        help='Overwrite an existing download without asking'
+    )
+    existing.add_argument(
+        '--keep-existing',
+        action='store_true',
+        help='Keep an existing download without asking'
+    )
+    args = parser.parse_args()
+    
     # Configuration
     dataset_url = "https://huggingface.co/datasets/tensonaut/EPSTEIN_FILES_20K/resolve/main/EPS_FILES_20K_NOV2025.csv"
     output_dir = Path("data/raw")
@@ -49,7 +64,11 @@ def main():
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Check if file already exists
-    if output_file.exists():
+    # Only prompt when someone can answer; unattended runs keep the existing file
+    if output_file.exists() and not args.force:
+        if args.keep_existing or not sys.stdin.isatty():
+            print(f"File already exists at {output_file}. Keeping it (use --force to overwrite).")
+            return
         response = input(f"File already exists at {output_file}. Overwrite? (y/n): ")
         if response.lower() != 'y':
             print("Download cancelled.")
@@ -8,9 +8,14 @@ into an organized directory structure based on the file naming convention.
 
 import csv
 import os
+import re
 import sys
+from collections import defaultdict
 from pathlib import Path
 
+# CATEGORY-SOURCE prefix of a filename stem (the parts before the first two dashes)
+FILENAME_PREFIX_RE = re.compile(r'([^-]*)-([^-]*)')
+
 
 def organize_data(csv_path, output_dir):
     """
@@ -30,9 +35,10 @@ def organize_data(csv_path, output_dir):
     # Statistics
     stats = {
         'total_files': 0,
-        'categories': {},
-        'sources': {}
+        'categories': defaultdict(int),
+        'sources': defaultdict(int)
     }
+    created_dirs = set()
     
     print(f"Reading CSV file: {csv_path}")
     
@@ -45,28 +51,30 @@ def organize_data(csv_path, output_dir):
             
             # Parse filename to extract category and source
             # Format: CATEGORY-SOURCE-IDENTIFIER.txt
-            parts = filename.rsplit('.', 1)[0].split('-')
+            match = FILENAME_PREFIX_RE.match(filename.rsplit('.', 1)[0])
             
-            if len(parts) >= 2:
-                category = parts[0]  # e.g., IMAGES, TEXT
-                source = parts[1]    # e.g., 001, 005
+            if match:
+                category, source = match.groups()  # e.g., IMAGES, 001
                 
                 # Track statistics
-                stats['categories'][category] = stats['categories'].get(category, 0) + 1
-                stats['sources'][source] = stats['sources'].get(source, 0) + 1
+                stats['categories'][category] += 1
+                stats['sources'][source] += 1
                 
-                # Create directory structure
+                # Directory structure: CATEGORY/SOURCE
                 category_dir = output_path / category / source
-                category_dir.mkdir(parents=True, exist_ok=True)
                 
                 # Write file
                 file_path = category_dir / filename
             else:
                 # If filename doesn't match expected pattern, put in 'uncategorized'
                 category_dir = output_path / 'uncategorized'
-                category_dir.mkdir(parents=True, exist_ok=True)
                 file_path = category_dir / filename
             
+            # Only ask the filesystem for each directory once
+            if category_dir not in created_dirs:
+                category_dir.mkdir(parents=True, exist_ok=True)
+                created_dirs.add(category_dir)
+            
             with open(file_path, 'w', encoding='utf-8') as out_file:
                 out_file.write(text)
             
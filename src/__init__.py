@@ -8,12 +8,13 @@ __version__ = "1.0.0"
 
 from .db import InvestigationDB
 from .librarian import ingest_documents, detect_duplicates
-from .detective import extract_entities, find_relationships
+from .detective import extract_entities, extract_entities_batch, find_relationships
 
 __all__ = [
     'InvestigationDB',
     'ingest_documents',
     'detect_duplicates',
     'extract_entities',
+    'extract_entities_batch',
     'find_relationships',
 ]
@@ -7,32 +7,55 @@ and extracted entities.
 
 import sqlite3
 import logging
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import Dict, Optional, List, Set, Tuple
+
+from .librarian import AVAILABLE_HASH_ALGORITHMS, DEFAULT_HASH_ALGORITHM, hash_algorithm_of
 
 logger = logging.getLogger(__name__)
 
+# Configuration constants
+SQLITE_BUSY_TIMEOUT = 5.0  # Seconds to wait for a lock held by another connection
+HASH_ALGORITHM_METADATA_KEY = 'hash_algorithm'  # metadata row naming the content hash algorithm
+
 
 class InvestigationDB:
     """Manages the SQLite database for investigation data."""
     
-    def __init__(self, db_path: str = "investigation.db"):
+    __slots__ = ('db_path', 'conn', 'hash_algorithm', '_in_transaction')
+    
+    def __init__(self, db_path: str = "investigation.db", hash_algorithm: Optional[str] = None):
         """
         Initialize the database connection.
         
         Args:
             db_path: Path to the SQLite database file
+            hash_algorithm: Content hash algorithm for a new database (default: SHA-256).
+                An existing database keeps the one it was created with; read it
+                back from the hash_algorithm attribute.
         """
         self.db_path = db_path
         self.conn = None
+        self._in_transaction = False
         self._initialize_database()
+        self.hash_algorithm = self._resolve_hash_algorithm(hash_algorithm)
     
     def _initialize_database(self):
         """Create the database and tables if they don't exist."""
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            # Wait for other writers instead of failing with "database is locked"
+            self.conn = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT)
             cursor = self.conn.cursor()
             
+            # WAL so readers don't block the writer; NORMAL sync is safe in WAL mode
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            # 20 MB page cache, in-memory temp tables, enforce doc_id references
+            cursor.execute("PRAGMA cache_size=-20000")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.execute("PRAGMA foreign_keys=ON")
+            
             # Create documents table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS documents (
@@ -63,16 +86,28 @@ class InvestigationDB:
                 ON entities(doc_id)
             """)
             
+            # Covers counts by type and value, and lookups by type
             cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_entities_type 
-                ON entities(entity_type)
+                CREATE INDEX IF NOT EXISTS idx_entities_type_value 
+                ON entities(entity_type, value)
             """)
             
+            # Superseded by idx_entities_type_value
+            cursor.execute("DROP INDEX IF EXISTS idx_entities_type")
+            
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_documents_hash 
                 ON documents(hash)
             """)
             
+            # Database-wide settings, e.g. the hash algorithm
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS metadata (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            """)
+            
             self.conn.commit()
             logger.info(f"Database initialized at {self.db_path}")
             
@@ -80,6 +115,45 @@ class InvestigationDB:
             logger.error(f"Error initializing database: {e}")
             raise
     
+    @contextmanager
+    def transaction(self):
+        """
+        Group many writes into a single transaction.
+        
+        Insert methods called inside the block do not commit individually;
+        everything is committed once when the block exits, or rolled back
+        if it raises.
+        
+        Yields:
+            This database
+        """
+        if self._in_transaction:
+            yield self
+            return
+        
+        self.conn.commit()  # Close any implicit transaction before starting ours
+        self.conn.execute("BEGIN IMMEDIATE")
+        self._in_transaction = True
+        try:
+            yield self
+        except BaseException:
+            self.conn.rollback()
+            raise
+        else:
+            self.conn.commit()
+        finally:
+            self._in_transaction = False
+    
+    def _commit(self):
+        """Commit, unless inside transaction() which commits once at the end."""
+        if not self._in_transaction:
+            self.conn.commit()
+    
+    def _rollback(self):
+        """Roll back, unless inside transaction() whose earlier writes must be kept."""
+        if not self._in_transaction:
+            self.conn.rollback()
+    
     def document_exists(self, file_hash: str) -> bool:
         """
         Check if a document with the given hash already exists.
@@ -101,6 +175,60 @@ class InvestigationDB:
             logger.error(f"Error checking document existence: {e}")
             return False
     
+    def get_document_hashes(self) -> Set[str]:
+        """
+        Get the hashes of all stored documents in a single query.
+        
+        Cheaper than calling document_exists() once per candidate file.
+        
+        Returns:
+            Set of document hashes
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT hash FROM documents")
+            return {row[0] for row in cursor}
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving document hashes: {e}")
+            return set()
+    
+    def _resolve_hash_algorithm(self, requested: Optional[str]) -> str:
+        """
+        Get the content hash algorithm of this database, recording it on first use.
+        
+        Args:
+            requested: Algorithm to use if the database does not have one yet
+            
+        Returns:
+            Algorithm name
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT value FROM metadata WHERE key = ?", (HASH_ALGORITHM_METADATA_KEY,))
+            row = cursor.fetchone()
+            if row:
+                algorithm = row[0]
+            else:
+                # Databases created before the algorithm was recorded: infer it from their hashes
+                cursor.execute("SELECT hash FROM documents ORDER BY id LIMIT 1")
+                row = cursor.fetchone()
+                algorithm = hash_algorithm_of(row[0]) if row else requested or DEFAULT_HASH_ALGORITHM
+                # Not recorded until usable, so a failed first run does not pin the database
+                if algorithm in AVAILABLE_HASH_ALGORITHMS:
+                    cursor.execute(
+                        "INSERT INTO metadata (key, value) VALUES (?, ?)",
+                        (HASH_ALGORITHM_METADATA_KEY, algorithm)
+                    )
+                    self.conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error resolving hash algorithm: {e}")
+            raise
+        
+        if requested and requested != algorithm:
+            logger.warning(f"Database already uses hash algorithm '{algorithm}'; "
+                           f"ignoring requested '{requested}'")
+        return algorithm
+    
     def insert_document(self, filename: str, raw_text: str, file_hash: str) -> Optional[int]:
         """
         Insert a new document into the database.
@@ -115,17 +243,18 @@ class InvestigationDB:
         """
         try:
             cursor = self.conn.cursor()
+            # Duplicates are skipped by SQLite itself instead of raising IntegrityError
             cursor.execute(
-                "INSERT INTO documents (filename, raw_text, hash) VALUES (?, ?, ?)",
+                "INSERT OR IGNORE INTO documents (filename, raw_text, hash) VALUES (?, ?, ?)",
                 (filename, raw_text, file_hash)
             )
-            self.conn.commit()
+            self._commit()
+            if cursor.rowcount == 0:
+                logger.warning(f"Document already exists: {filename}")
+                return None
             doc_id = cursor.lastrowid
             logger.debug(f"Inserted document: {filename} (ID: {doc_id})")
             return doc_id
-        except sqlite3.IntegrityError:
-            logger.warning(f"Document already exists: {filename}")
-            return None
         except sqlite3.Error as e:
             logger.error(f"Error inserting document: {e}")
             return None
@@ -151,7 +280,7 @@ class InvestigationDB:
                    VALUES (?, ?, ?, ?)""",
                 (doc_id, entity_type, value, context_snippet)
             )
-            self.conn.commit()
+            self._commit()
             entity_id = cursor.lastrowid
             logger.debug(f"Inserted entity: {entity_type} - {value} (ID: {entity_id})")
             return entity_id
@@ -159,6 +288,52 @@ class InvestigationDB:
             logger.error(f"Error inserting entity: {e}")
             return None
     
+    def insert_entities(self, doc_id: int, entities: Dict[str, List[Tuple[str, Optional[str]]]]) -> int:
+        """
+        Insert all entities of a document with a single statement and commit.
+        
+        Inside transaction() the insert is wrapped in a savepoint, so a failure
+        leaves none of the document's entities in the enclosing transaction.
+        
+        Args:
+            doc_id: ID of the document containing the entities
+            entities: Dictionary mapping entity types to lists of (value, context_snippet) tuples
+            
+        Returns:
+            Number of entities inserted
+        """
+        rows = [
+            (doc_id, entity_type, value, context_snippet)
+            for entity_type, entity_list in entities.items()
+            for value, context_snippet in entity_list
+        ]
+        if not rows:
+            return 0
+        
+        savepoint = self._in_transaction
+        try:
+            if savepoint:
+                self.conn.execute("SAVEPOINT insert_entities")
+            cursor = self.conn.cursor()
+            cursor.executemany(
+                """INSERT INTO entities (doc_id, entity_type, value, context_snippet) 
+                   VALUES (?, ?, ?, ?)""",
+                rows
+            )
+            if savepoint:
+                self.conn.execute("RELEASE insert_entities")
+            self._commit()
+            logger.debug(f"Inserted {len(rows)} entities for document ID {doc_id}")
+            return len(rows)
+        except sqlite3.Error as e:
+            if savepoint:
+                # Undo the rows inserted before the failure, keep the rest of the transaction
+                self.conn.execute("ROLLBACK TO insert_entities")
+                self.conn.execute("RELEASE insert_entities")
+            self._rollback()
+            logger.error(f"Error inserting entities: {e}")
+            return 0
+    
     def get_document_by_id(self, doc_id: int) -> Optional[Tuple]:
         """
         Retrieve a document by its ID.
@@ -236,10 +411,6 @@ class InvestigationDB:
             cursor.execute("SELECT COUNT(*) FROM documents")
             doc_count = cursor.fetchone()[0]
             
-            # Count entities
-            cursor.execute("SELECT COUNT(*) FROM entities")
-            entity_count = cursor.fetchone()[0]
-            
             # Count entities by type
             cursor.execute("""
                 SELECT entity_type, COUNT(*) 
@@ -247,6 +418,7 @@ class InvestigationDB:
                 GROUP BY entity_type
             """)
             entity_by_type = dict(cursor.fetchall())
+            entity_count = sum(entity_by_type.values())
             
             return {
                 'documents': doc_count,
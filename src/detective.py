@@ -5,10 +5,13 @@ This module handles entity extraction (people, money, dates) and
 relationship discovery from text documents.
 """
 
+import importlib.util
 import logging
 import re
-from typing import List, Dict, Tuple, Set
-from collections import defaultdict
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Tuple, Set
+from collections import Counter
 
 logger = logging.getLogger(__name__)
 
@@ -16,28 +19,115 @@ logger = logging.getLogger(__name__)
 MAX_TEXT_SIZE_FOR_SPACY = 1000000  # Maximum text size to process with spaCy (1MB)
 ENTITY_CONTEXT_WINDOW = 50  # Characters to include before and after entity for context
 RELATIONSHIP_PROXIMITY_THRESHOLD = 500  # Max character distance to consider entities related
+SPACY_BATCH_SIZE = 64  # Number of documents buffered per nlp.pipe batch
+SPACY_MODEL_NAME = "en_core_web_sm"  # Default spaCy model for entity extraction
 
-# Try to import spaCy
-try:
-    import spacy
-    SPACY_AVAILABLE = True
-    # Global spaCy model - will be loaded on first use
-    _nlp_model = None
-except ImportError:
-    SPACY_AVAILABLE = False
+# Context snippets are shown on one line: control characters (newlines, tabs, Tesseract's
+# form-feed page breaks, ...) become spaces. The mapping preserves length, so a document
+# can be translated once and snippets sliced from it at the original offsets.
+_CONTEXT_TRANSLATION = {c: ' ' for c in [*range(0x00, 0x20), 0x7f, 0xa0]}
+
+# PDF text often separates words with no-break spaces (U+00A0). Scanning them as plain
+# spaces stores "John\xa0Smith" and "John Smith" as one value, so per-value counts and
+# relationships don't split on them. Length preserving.
+_SCAN_TRANSLATION = {0xa0: ' '}
+
+# Pipeline components not needed for NER; disabling them skips most of the per-document work
+SPACY_DISABLED_COMPONENTS = ["tagger", "parser", "lemmatizer", "attribute_ruler"]
+
+# Regex fallback patterns
+MONEY_PATTERNS = [
+    r'\$\s*[\d,]+(?:\.\d{2})?',  # $1,234.56
+    r'USD\s*[\d,]+(?:\.\d{2})?',  # USD 1234.56
+    r'[\d,]+(?:\.\d{2})?\s*(?:dollars|USD)',  # 1234.56 dollars
+]
+
+DATE_PATTERNS = [
+    r'\d{1,2}/\d{1,2}/\d{2,4}',  # MM/DD/YYYY or M/D/YY
+    r'\d{1,2}-\d{1,2}-\d{2,4}',  # MM-DD-YYYY
+    r'(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4}',  # Month DD, YYYY
+    r'\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.?\s+\d{4}',  # DD Month YYYY
+]
+
+# Person names (proper nouns - basic pattern): capitalized words that appear to be names
+NAME_PATTERN = r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)+\b'
+
+# Each entity type's patterns are joined into one alternation, so the text is scanned
+# once per type. Types keep separate passes: a shared alternation would let a money
+# match consume an overlapping date ("$\n12/25/2020") or vice versa. Within a type,
+# overlapping hits are found once, leftmost first: "$1,500,000 USD" gives one amount
+# instead of two, and "2020 USD 5,000" gives "2020 USD" but not "USD 5,000".
+_MONEY_RE = re.compile('|'.join(MONEY_PATTERNS), re.IGNORECASE)
+_DATE_RE = re.compile('|'.join(DATE_PATTERNS), re.IGNORECASE)
+_NAME_RE = re.compile(NAME_PATTERN)
+
+# Lowercased phrases that look like names but are places, courts, agencies, etc.
+_NAME_FALSE_POSITIVES = (
+    'united states', 'new york', 'los angeles', 'san francisco',
+    'united kingdom', 'supreme court', 'district court', 'federal bureau',
+    'department of', 'state of', 'city of', 'county of'
+)
+
+# All phrases in one pattern, matched on word boundaries so that e.g. "Felicity Ofori"
+# is not rejected for containing "city of"
+_NAME_FALSE_POSITIVE_RE = re.compile(
+    r'\b(?:' + '|'.join(re.escape(phrase) for phrase in _NAME_FALSE_POSITIVES) + r')\b',
+    re.IGNORECASE
+)
+
+# Check for spaCy without importing it: the import takes seconds and is only needed
+# once a model is loaded, not for --stats-only runs or regex-only worker processes
+SPACY_AVAILABLE = importlib.util.find_spec("spacy") is not None
+if not SPACY_AVAILABLE:
     logger.warning("spaCy not available. Entity extraction will use regex fallback.")
 
+# Global spaCy model - loaded once per process on first use, read-only afterwards
+_nlp_model = None
+_nlp_model_name = SPACY_MODEL_NAME
+_nlp_load_failed = False
+_nlp_on_gpu = False  # Whether spacy.prefer_gpu() activated a GPU for the model
+_nlp_lock = threading.Lock()
+
+
+def set_spacy_model(name: str):
+    """
+    Select the spaCy model used for entity extraction.
+    
+    Use e.g. 'en_core_web_sm' on CPU or 'en_core_web_trf' when a GPU is
+    available. The model is loaded on next use.
+    
+    Args:
+        name: Name of an installed spaCy model package
+    """
+    global _nlp_model, _nlp_model_name, _nlp_load_failed, _nlp_on_gpu
+    with _nlp_lock:
+        _nlp_model = None
+        _nlp_model_name = name
+        _nlp_load_failed = False
+        _nlp_on_gpu = False
+
 
 def _load_spacy_model():
     """Load spaCy model lazily."""
-    global _nlp_model
-    if _nlp_model is None and SPACY_AVAILABLE:
-        try:
-            _nlp_model = spacy.load("en_core_web_sm")
-            logger.info("Loaded spaCy model: en_core_web_sm")
-        except OSError:
-            logger.warning("spaCy model 'en_core_web_sm' not found. Using regex fallback.")
-            logger.info("Run 'python -m spacy download en_core_web_sm' to enable spaCy.")
+    global _nlp_model, _nlp_load_failed, _nlp_on_gpu
+    if _nlp_model is None and not _nlp_load_failed and SPACY_AVAILABLE:
+        with _nlp_lock:
+            if _nlp_model is None and not _nlp_load_failed:
+                try:
+                    import spacy
+                    # Use the GPU for NER when one is available
+                    _nlp_on_gpu = spacy.prefer_gpu()
+                    if _nlp_on_gpu:
+                        logger.info("Using GPU for spaCy")
+                    _nlp_model = spacy.load(_nlp_model_name, disable=SPACY_DISABLED_COMPONENTS)
+                    logger.info(f"Loaded spaCy model: {_nlp_model_name}")
+                except ImportError as e:
+                    _nlp_load_failed = True
+                    logger.warning(f"spaCy could not be imported ({e}). Using regex fallback.")
+                except OSError:
+                    _nlp_load_failed = True
+                    logger.warning(f"spaCy model '{_nlp_model_name}' not found. Using regex fallback.")
+                    logger.info(f"Run 'python -m spacy download {_nlp_model_name}' to enable spaCy.")
     return _nlp_model
 
 
@@ -85,6 +175,56 @@ def extract_entities(text: str, use_spacy: bool = True) -> Dict[str, List[Tuple[
     return entities
 
 
+def extract_entities_batch(texts: Iterable[str], use_spacy: bool = True,
+                           batch_size: int = SPACY_BATCH_SIZE,
+                           n_process: int = 1) -> Iterator[Dict[str, List[Tuple[str, str]]]]:
+    """
+    Extract entities from many texts, streaming them through spaCy's nlp.pipe.
+    
+    Batching reuses the loaded pipeline across documents and lets spaCy
+    spread the work over several processes, which is much faster than
+    calling extract_entities() once per document. The regex fallback is
+    spread over a process pool in the same way.
+    
+    Args:
+        texts: Input texts to analyze
+        use_spacy: Whether to attempt using spaCy (falls back to regex if unavailable)
+        batch_size: Number of texts to buffer per batch
+        n_process: Number of processes to use (capped at one per batch; a
+            spaCy model on the GPU always runs in this process)
+        
+    Yields:
+        One entity dictionary per input text, in input order
+    """
+    texts = list(texts)
+    done = 0
+    
+    # Extra processes only pay off when each one gets at least a full batch
+    n_process = max(1, min(n_process, -(-len(texts) // batch_size)))
+    
+    nlp = _load_spacy_model() if use_spacy and SPACY_AVAILABLE else None
+    if nlp:
+        try:
+            # spaCy cannot share a GPU model across processes, and forking after
+            # CUDA initialization fails
+            docs = nlp.pipe((text[:MAX_TEXT_SIZE_FOR_SPACY] for text in texts),
+                            batch_size=batch_size, n_process=1 if _nlp_on_gpu else n_process)
+            for doc, text in zip(docs, texts):
+                yield _entities_from_doc(doc, text)
+                done += 1
+            return
+        except Exception as e:
+            logger.warning(f"spaCy batch extraction failed, falling back to regex: {e}")
+    
+    # Fallback to regex-based extraction for anything spaCy did not handle
+    remaining = texts[done:]
+    if n_process == 1:
+        yield from map(_extract_entities_regex, remaining)
+    else:
+        with ProcessPoolExecutor(max_workers=n_process) as executor:
+            yield from executor.map(_extract_entities_regex, remaining, chunksize=batch_size)
+
+
 def _extract_entities_spacy(text: str, nlp) -> Dict[str, List[Tuple[str, str]]]:
     """
     Extract entities using spaCy NLP.
@@ -93,6 +233,22 @@ def _extract_entities_spacy(text: str, nlp) -> Dict[str, List[Tuple[str, str]]]:
         text: Input text
         nlp: Loaded spaCy model
         
+    Returns:
+        Dictionary of entities with context
+    """
+    # Process text with spaCy
+    doc = nlp(text[:MAX_TEXT_SIZE_FOR_SPACY])  # Limit text size to avoid memory issues
+    return _entities_from_doc(doc, text)
+
+
+def _entities_from_doc(doc, text: str) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    Collect PERSON, MONEY and DATE entities from a processed spaCy doc.
+    
+    Args:
+        doc: spaCy Doc produced from (a prefix of) text
+        text: Original input text, used for context snippets
+        
     Returns:
         Dictionary of entities with context
     """
@@ -102,14 +258,11 @@ def _extract_entities_spacy(text: str, nlp) -> Dict[str, List[Tuple[str, str]]]:
         'DATE': []
     }
     
-    # Process text with spaCy
-    doc = nlp(text[:MAX_TEXT_SIZE_FOR_SPACY])  # Limit text size to avoid memory issues
+    context_text = text.translate(_CONTEXT_TRANSLATION)
     
     for ent in doc.ents:
         # Get context snippet (±ENTITY_CONTEXT_WINDOW characters around entity)
-        start_idx = max(0, ent.start_char - ENTITY_CONTEXT_WINDOW)
-        end_idx = min(len(text), ent.end_char + ENTITY_CONTEXT_WINDOW)
-        context = text[start_idx:end_idx].replace('\n', ' ').strip()
+        context = _get_context(context_text, ent.start_char, ent.end_char)
         
         if ent.label_ == 'PERSON':
             entities['PERSON'].append((ent.text, context))
@@ -137,43 +290,23 @@ def _extract_entities_regex(text: str) -> Dict[str, List[Tuple[str, str]]]:
         'DATE': []
     }
     
-    # Extract money patterns
-    money_patterns = [
-        r'\$\s*[\d,]+(?:\.\d{2})?',  # $1,234.56
-        r'USD\s*[\d,]+(?:\.\d{2})?',  # USD 1234.56
-        r'[\d,]+(?:\.\d{2})?\s*(?:dollars|USD)',  # 1234.56 dollars
-    ]
+    scan_text = text.translate(_SCAN_TRANSLATION)
+    context_text = text.translate(_CONTEXT_TRANSLATION)
     
-    for pattern in money_patterns:
-        for match in re.finditer(pattern, text, re.IGNORECASE):
+    # Extract money and date patterns
+    for entity_type, pattern in (('MONEY', _MONEY_RE), ('DATE', _DATE_RE)):
+        for match in pattern.finditer(scan_text):
             value = match.group(0)
-            context = _get_context(text, match.start(), match.end())
-            entities['MONEY'].append((value, context))
-    
-    # Extract date patterns
-    date_patterns = [
-        r'\d{1,2}/\d{1,2}/\d{2,4}',  # MM/DD/YYYY or M/D/YY
-        r'\d{1,2}-\d{1,2}-\d{2,4}',  # MM-DD-YYYY
-        r'(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4}',  # Month DD, YYYY
-        r'\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.?\s+\d{4}',  # DD Month YYYY
-    ]
-    
-    for pattern in date_patterns:
-        for match in re.finditer(pattern, text, re.IGNORECASE):
-            value = match.group(0)
-            context = _get_context(text, match.start(), match.end())
-            entities['DATE'].append((value, context))
-    
-    # Extract person names (proper nouns - basic pattern)
-    # Look for capitalized words that appear to be names
-    name_pattern = r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)+\b'
+            context = _get_context(context_text, match.start(), match.end())
+            entities[entity_type].append((value, context))
     
-    for match in re.finditer(name_pattern, text):
+    # Extract person names
+    for match in _NAME_RE.finditer(scan_text):
         value = match.group(0)
         # Filter out common false positives
         if not _is_likely_name(value):
             continue
-        context = _get_context(text, match.start(), match.end())
+        context = _get_context(context_text, match.start(), match.end())
         entities['PERSON'].append((value, context))
     
     return entities
@@ -184,7 +317,7 @@ def _get_context(text: str, start: int, end: int, window: int = ENTITY_CONTEXT_W
     Get context snippet around a match.
     
     Args:
-        text: Full text
+        text: Full text, already translated with _CONTEXT_TRANSLATION
         start: Start index of match
         end: End index of match
         window: Number of characters to include before and after
@@ -192,10 +325,7 @@ def _get_context(text: str, start: int, end: int, window: int = ENTITY_CONTEXT_W
     Returns:
         Context snippet
     """
-    context_start = max(0, start - window)
-    context_end = min(len(text), end + window)
-    context = text[context_start:context_end].replace('\n', ' ').strip()
-    return context
+    return text[max(0, start - window):end + window].strip()
 
 
 def _is_likely_name(text: str) -> bool:
@@ -210,17 +340,6 @@ def _is_likely_name(text: str) -> bool:
     Returns:
         True if likely a name, False otherwise
     """
-    # Filter out common false positives
-    false_positives = {
-        'United States', 'New York', 'Los Angeles', 'San Francisco',
-        'United Kingdom', 'Supreme Court', 'District Court', 'Federal Bureau',
-        'Department Of', 'State Of', 'City Of', 'County Of'
-    }
-    
-    for fp in false_positives:
-        if fp.lower() in text.lower():
-            return False
-    
     # Names should have 2-4 words
     words = text.split()
     if len(words) < 2 or len(words) > 4:
@@ -231,6 +350,10 @@ def _is_likely_name(text: str) -> bool:
         if len(word) < 2 or len(word) > 15:
             return False
     
+    # Filter out common false positives
+    if _NAME_FALSE_POSITIVE_RE.search(text):
+        return False
+    
     return True
 
 
@@ -258,45 +381,86 @@ def find_relationships(text: str, entities: Dict[str, List[Tuple[str, str]]]) ->
     # Extract unique person names
     person_names = list(set(name for name, _ in people))
     
+    # Find all positions of each name once (case-insensitive), treating
+    # no-break spaces as spaces like _extract_entities_regex does
+    scan_text = text.translate(_SCAN_TRANSLATION)
+    text_lower = scan_text.lower()
+    if len(text_lower) == len(scan_text):
+        positions = {
+            name: _find_all(name.translate(_SCAN_TRANSLATION).lower(), text_lower)
+            for name in person_names
+        }
+    else:
+        # Lowercasing changed some character widths, so offsets would not line up
+        positions = {
+            name: [m.start() for m in re.finditer(re.escape(name.translate(_SCAN_TRANSLATION)),
+                                                  scan_text, re.IGNORECASE)]
+            for name in person_names
+        }
+    
+    # Translated lazily, only once a relationship needs a context snippet
+    context_text = None
+    
     # Find co-occurrences within the same document
     for i, person1 in enumerate(person_names):
         for person2 in person_names[i+1:]:
-            # Find all positions of both names in text
-            positions1 = [m.start() for m in re.finditer(re.escape(person1), text, re.IGNORECASE)]
-            positions2 = [m.start() for m in re.finditer(re.escape(person2), text, re.IGNORECASE)]
+            positions1 = positions[person1]
+            positions2 = positions[person2]
             
             if not positions1 or not positions2:
                 continue
             
             # Find closest co-occurrences
-            close_occurrences = []
+            # Find closest co-occurrence
+            closest = None
             
             for pos1 in positions1:
                 for pos2 in positions2:
                     distance = abs(pos1 - pos2)
-                    if distance <= RELATIONSHIP_PROXIMITY_THRESHOLD:
-                        # Get context around both mentions
-                        start = min(pos1, pos2) - ENTITY_CONTEXT_WINDOW
-                        end = max(pos1, pos2) + max(len(person1), len(person2)) + ENTITY_CONTEXT_WINDOW
-                        start = max(0, start)
-                        end = min(len(text), end)
-                        context = text[start:end].replace('\n', ' ').strip()
-                        close_occurrences.append({
-                            'person1': person1,
-                            'person2': person2,
-                            'distance': distance,
-                            'context': context
-                        })
+                    if distance <= RELATIONSHIP_PROXIMITY_THRESHOLD and (closest is None or distance < closest[0]):
+                        closest = (distance, pos1, pos2)
             
-            if close_occurrences:
-                # Keep the closest occurrence
-                closest = min(close_occurrences, key=lambda x: x['distance'])
-                relationships.append(closest)
+            if closest:
+                # Get context around both mentions
+                distance, pos1, pos2 = closest
+                if context_text is None:
+                    context_text = text.translate(_CONTEXT_TRANSLATION)
+                start = max(0, min(pos1, pos2) - ENTITY_CONTEXT_WINDOW)
+                end = max(pos1, pos2) + max(len(person1), len(person2)) + ENTITY_CONTEXT_WINDOW
+                relationships.append({
+                    'person1': person1,
+                    'person2': person2,
+                    'distance': distance,
+                    'context': context_text[start:end].strip()
+                })
     
     logger.debug(f"Found {len(relationships)} relationships")
     return relationships
 
 
+def _find_all(needle: str, haystack: str) -> List[int]:
+    """
+    Find start positions of all non-overlapping occurrences of needle.
+    
+    Args:
+        needle: Substring to search for
+        haystack: Text to search in
+        
+    Returns:
+        List of start indices
+    """
+    positions = []
+    if not needle:
+        return positions
+    
+    step = len(needle)
+    index = haystack.find(needle)
+    while index >= 0:
+        positions.append(index)
+        index = haystack.find(needle, index + step)
+    return positions
+
+
 def find_entity_cooccurrences(entities: Dict[str, List[Tuple[str, str]]], 
                               window_size: int = 100) -> Dict[Tuple[str, str], int]:
     """
@@ -307,26 +471,22 @@ def find_entity_cooccurrences(entities: Dict[str, List[Tuple[str, str]]],
         window_size: Character window to consider for co-occurrence
         
     Returns:
-        Dictionary mapping entity pairs to co-occurrence count
+        Dictionary mapping entity pairs to co-occurrence count (product of their mention counts)
     """
-    cooccurrences = defaultdict(int)
-    
-    people = entities.get('PERSON', [])
+    cooccurrences = {}
     
-    # Create a list of (name, position_estimate) based on context
-    # This is simplified - in reality we'd need exact positions
-    person_names = [name for name, _ in people]
+    # Count how often each person is mentioned
+    mention_counts = Counter(name for name, _ in entities.get('PERSON', []))
     
-    # Count unique co-occurrences
-    unique_people = list(set(person_names))
+    if len(mention_counts) < 2:
+        return cooccurrences
     
+    # Every mention of one person can pair with every mention of the other
+    unique_people = list(mention_counts)
     for i, person1 in enumerate(unique_people):
+        count1 = mention_counts[person1]
         for person2 in unique_people[i+1:]:
-            # Count how many times they appear together in contexts
-            count = sum(1 for name in person_names if name == person1) * \
-                   sum(1 for name in person_names if name == person2)
-            if count > 0:
-                pair = tuple(sorted([person1, person2]))
-                cooccurrences[pair] += 1
-    
-    return dict(cooccurrences)
+            pair = tuple(sorted([person1, person2]))
+            cooccurrences[pair] = count1 * mention_counts[person2]
+    
+    return cooccurrences
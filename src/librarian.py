@@ -6,15 +6,35 @@ This module handles document discovery, OCR processing, and deduplication.
 
 import hashlib
 import logging
+import logging.handlers
+import mmap
+import multiprocessing
 import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import AbstractSet, Dict, Iterable, Iterator, List, Tuple, Optional
 import mimetypes
 
 logger = logging.getLogger(__name__)
 
 # Configuration constants
-MIN_TEXT_LENGTH_FOR_DIRECT_EXTRACTION = 100  # Minimum text length to consider direct PDF extraction successful
+MIN_PAGE_TEXT_LENGTH_FOR_DIRECT_EXTRACTION = 50  # Average embedded text per PDF page to skip OCR
+INGEST_CHUNK_SIZE = 4  # Files handed to a worker process at a time
+HASH_BLOCK_SIZE = 1 << 20  # Read size when a file cannot be memory-mapped (1 MiB)
+HEAD_SIZE_FOR_DUPLICATE_CHECK = 4096  # Leading bytes compared before hashing a whole file
+OCR_MAX_THREADS = 4  # Max pages of one PDF OCR'd concurrently
+PDF_OCR_DPI = 200  # Resolution PDF pages are rasterized at for OCR
+DEFAULT_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.txt')  # Scanned when no extensions are given
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff'})  # OCR'd as images
+TEXT_ENCODINGS = ('utf-8', 'latin-1', 'cp1252')  # Tried in order when decoding text files
+DEFAULT_HASH_ALGORITHM = 'sha256'  # Content hash unless a database was created with another
+
+# LSTM engine only, one uniform block of text per page (faster than automatic segmentation)
+TESSERACT_CONFIG = '--oem 1 --psm 6'
+
+# OCR is already parallel across processes and threads; Tesseract's OpenMP would oversubscribe
+TESSERACT_OMP_THREAD_LIMIT = '1'
 
 # Try to import OCR dependencies
 try:
@@ -26,7 +46,7 @@ except ImportError:
     logger.warning("pytesseract or PIL not available. OCR functionality will be limited.")
 
 try:
-    from pdf2image import convert_from_path
+    from pdf2image import convert_from_path, pdfinfo_from_path
     PDF2IMAGE_AVAILABLE = True
 except ImportError:
     PDF2IMAGE_AVAILABLE = False
@@ -39,44 +59,205 @@ except ImportError:
     PYPDF2_AVAILABLE = False
     logger.warning("PyPDF2 not available. PDF text extraction will be limited.")
 
+# Optional hash for databases created with --hash-algorithm blake3
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+    logger.debug("blake3 not available. Using hashlib for file hashing.")
+
+
+# Digest prefix per algorithm (SHA-256 stays bare hex, as in existing databases)
+HASH_PREFIXES = {'sha256': '', 'blake2b': 'b2:', 'blake3': 'b3:'}
+
+# Hash object constructors for the algorithms usable in this environment
+_HASH_FACTORIES = {
+    'sha256': hashlib.sha256,
+    'blake2b': lambda: hashlib.blake2b(digest_size=32),
+}
+if BLAKE3_AVAILABLE:
+    # Single-threaded: files are already hashed in parallel across worker processes
+    _HASH_FACTORIES['blake3'] = blake3.blake3
+
+AVAILABLE_HASH_ALGORITHMS = frozenset(_HASH_FACTORIES)
+
+
+def hash_algorithm_of(file_hash: str) -> str:
+    """
+    Identify the algorithm a stored hash was computed with from its prefix.
+    
+    Args:
+        file_hash: Hash string as returned by compute_file_hash
+        
+    Returns:
+        Algorithm name ('sha256', 'blake2b' or 'blake3')
+    """
+    for algorithm, prefix in HASH_PREFIXES.items():
+        if prefix and file_hash.startswith(prefix):
+            return algorithm
+    return 'sha256'
+
 
-def compute_file_hash(file_path: str) -> str:
+def compute_file_hash(file_path: str, algorithm: str = DEFAULT_HASH_ALGORITHM) -> str:
     """
-    Compute SHA256 hash of a file.
+    Compute the content hash of a file.
+    
+    BLAKE3 and BLAKE2b digests are prefixed with 'b3:' and 'b2:'; SHA-256
+    digests are bare hex.
     
     Args:
         file_path: Path to the file
+        algorithm: 'sha256', 'blake2b' or 'blake3'; pass InvestigationDB.hash_algorithm
+            when comparing with stored hashes
         
     Returns:
         Hexadecimal hash string
     """
-    sha256_hash = hashlib.sha256()
+    new_hasher = _HASH_FACTORIES[algorithm]
+    file_hash = new_hasher()
     try:
-        with open(file_path, "rb") as f:
-            # Read file in chunks to handle large files
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+        # Unbuffered: reads below are large
+        with open(file_path, "rb", buffering=0) as f:
+            try:
+                # Hash the whole file straight from the page cache
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    file_hash.update(mm)
+            except (ValueError, OSError):
+                # Empty files and non-regular files cannot be mapped; read in large blocks
+                if hasattr(hashlib, 'file_digest'):
+                    # Python 3.11+: reuses a single buffer
+                    file_hash = hashlib.file_digest(f, new_hasher)
+                else:
+                    buffer = bytearray(HASH_BLOCK_SIZE)
+                    view = memoryview(buffer)
+                    while True:
+                        size = f.readinto(buffer)
+                        if not size:
+                            break
+                        file_hash.update(view[:size])
+        return HASH_PREFIXES[algorithm] + file_hash.hexdigest()
     except Exception as e:
         logger.error(f"Error computing hash for {file_path}: {e}")
         return ""
 
 
-def ingest_documents(directory: str, extensions: Optional[List[str]] = None) -> List[Tuple[str, str, str]]:
+def _iter_document_files(directory: str, extensions: Iterable[str]) -> Iterator[str]:
+    """
+    Recursively yield paths of files under directory with one of the given extensions.
+    
+    Uses os.scandir to avoid a stat call per file.
+    
+    Args:
+        directory: Root directory to scan
+        extensions: Lowercase extensions including the leading dot
+        
+    Yields:
+        File paths as strings
+    """
+    extensions = tuple(extensions)
+    stack = [directory]
+    
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        # A bare ".txt" is a dotfile, not an extension
+                        name = entry.name.lower()
+                        if name.endswith(extensions) and name not in extensions:
+                            yield entry.path
+        except OSError as e:
+            logger.warning(f"Cannot scan directory {current}: {e}")
+
+
+def _find_duplicate_files(file_paths: List[str],
+                          hash_algorithm: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Find files whose contents duplicate an earlier file in the list.
+    
+    Files are grouped by size, then by a digest of their first
+    HEAD_SIZE_FOR_DUPLICATE_CHECK bytes. Full hashes are only computed
+    when both match, so unique files are never read in full here.
+    
+    Args:
+        file_paths: Paths in discovery order
+        hash_algorithm: Algorithm for the full hashes
+        
+    Returns:
+        Tuple of (dictionary mapping each duplicate path to the first path with
+        the same content, dictionary mapping each of those first paths to the
+        full hash computed for it)
+    """
+    by_size = defaultdict(list)
+    for file_path in file_paths:
+        try:
+            by_size[os.path.getsize(file_path)].append(file_path)
+        except OSError:
+            continue
+    
+    duplicates = {}
+    file_hashes = {}
+    for same_size in by_size.values():
+        if len(same_size) < 2:
+            continue
+        
+        by_head = defaultdict(list)
+        for file_path in same_size:
+            try:
+                with open(file_path, "rb", buffering=0) as f:
+                    head = f.read(HEAD_SIZE_FOR_DUPLICATE_CHECK)
+            except OSError:
+                continue
+            by_head[hashlib.blake2b(head, digest_size=16).digest()].append(file_path)
+        
+        for same_head in by_head.values():
+            if len(same_head) < 2:
+                continue
+            first_by_hash = {}
+            for file_path in same_head:
+                file_hash = compute_file_hash(file_path, hash_algorithm)
+                if not file_hash:
+                    continue
+                if file_hash in first_by_hash:
+                    duplicates[file_path] = first_by_hash[file_hash]
+                else:
+                    first_by_hash[file_hash] = file_path
+                    file_hashes[file_path] = file_hash
+    
+    return duplicates, file_hashes
+
+
+def ingest_documents(directory: str, extensions: Optional[List[str]] = None,
+                     workers: Optional[int] = None,
+                     known_hashes: Optional[AbstractSet[str]] = None,
+                     hash_algorithm: str = DEFAULT_HASH_ALGORITHM) -> List[Tuple[str, str, str]]:
     """
     Recursively scan directory for documents and extract text.
     
-    Scans for .pdf, .jpg, .jpeg, .png, .txt files by default.
+    Scans for .pdf, .jpg, .jpeg, .png, .txt files by default. Files are
+    hashed and OCR'd in a pool of worker processes; results keep the
+    order in which files were discovered. Byte-identical copies found in
+    the same scan are not extracted again but reuse the first copy's text.
+    Files whose hash is in known_hashes (e.g. already stored in the
+    database) are not extracted either and are returned with empty text.
     
     Args:
         directory: Root directory to scan
         extensions: List of file extensions to process (default: ['.pdf', '.jpg', '.jpeg', '.png', '.txt'])
+        workers: Number of worker processes (default: os.cpu_count(); 1 processes serially)
+        known_hashes: File hashes whose text is already available and need not be extracted
+        hash_algorithm: Algorithm to hash files with; pass InvestigationDB.hash_algorithm
+            when the results are stored in or compared with a database
         
     Returns:
         List of tuples: (filename, extracted_text, file_hash)
     """
     if extensions is None:
-        extensions = ['.pdf', '.jpg', '.jpeg', '.png', '.txt']
+        extensions = DEFAULT_EXTENSIONS
     
     # Normalize extensions to lowercase
     extensions = [ext.lower() if ext.startswith('.') else f'.{ext.lower()}' for ext in extensions]
@@ -91,34 +272,149 @@ def ingest_documents(directory: str, extensions: Optional[List[str]] = None) ->
     logger.info(f"Scanning directory: {directory}")
     
     # Recursively find all files with specified extensions
-    for file_path in directory_path.rglob('*'):
-        if file_path.is_file() and file_path.suffix.lower() in extensions:
-            try:
-                logger.debug(f"Processing file: {file_path}")
-                
-                # Compute file hash
-                file_hash = compute_file_hash(str(file_path))
-                if not file_hash:
-                    logger.warning(f"Skipping file with empty hash: {file_path}")
-                    continue
-                
-                # Extract text based on file type
-                extracted_text = extract_text_from_file(str(file_path))
-                
-                if extracted_text:
-                    documents.append((str(file_path), extracted_text, file_hash))
-                    logger.info(f"Successfully processed: {file_path.name}")
-                else:
-                    logger.warning(f"No text extracted from: {file_path.name}")
-                    
-            except Exception as e:
-                logger.error(f"Error processing {file_path}: {e}")
-                continue
+    file_paths = list(_iter_document_files(directory, extensions))
+    
+    # Only extract text once for byte-identical copies
+    duplicate_of, file_hashes = _find_duplicate_files(file_paths, hash_algorithm)
+    unique_paths = [file_path for file_path in file_paths if file_path not in duplicate_of]
+    # Files already hashed while looking for duplicates are not hashed again
+    unique_hashes = [file_hashes.get(file_path) for file_path in unique_paths]
+    if duplicate_of:
+        logger.debug(f"Skipping extraction for {len(duplicate_of)} duplicate files")
+    
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(unique_paths)))
+    
+    known_hashes = frozenset(known_hashes or ())
+    
+    # Share the cores between worker processes and the per-PDF OCR threads of each
+    ocr_threads = max(1, min(OCR_MAX_THREADS, (os.cpu_count() or 1) // workers))
+    
+    if workers == 1:
+        previous_omp_limit = os.environ.get('OMP_THREAD_LIMIT')
+        _init_worker(known_hashes, hash_algorithm, ocr_threads)
+        try:
+            results = list(map(_process_file, unique_paths, unique_hashes))
+        finally:
+            _init_worker(frozenset(), DEFAULT_HASH_ALGORITHM, OCR_MAX_THREADS)
+            if previous_omp_limit is None:
+                os.environ.pop('OMP_THREAD_LIMIT', None)
+            else:
+                os.environ['OMP_THREAD_LIMIT'] = previous_omp_limit
+    else:
+        logger.debug(f"Processing {len(unique_paths)} files with {workers} worker processes")
+        # Workers log through a queue; spawn/forkserver don't inherit our handlers
+        mp_context = multiprocessing.get_context()
+        log_queue = mp_context.Queue()
+        root_logger = logging.getLogger()
+        log_listener = logging.handlers.QueueListener(log_queue, *root_logger.handlers,
+                                                      respect_handler_level=True)
+        log_listener.start()
+        try:
+            # The known hashes are sent to each worker once, not with every file
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context,
+                                     initializer=_init_worker,
+                                     initargs=(known_hashes, hash_algorithm, ocr_threads,
+                                               log_queue, root_logger.level)) as executor:
+                results = list(executor.map(_process_file, unique_paths, unique_hashes,
+                                            chunksize=INGEST_CHUNK_SIZE))
+        finally:
+            log_listener.stop()
+    
+    known_count = sum(1 for result in results if result and not result[1])
+    if known_count:
+        logger.info(f"Skipping extraction for {known_count} files already processed")
+    
+    extracted = dict(zip(unique_paths, results))
+    for file_path in file_paths:
+        if file_path in duplicate_of:
+            original = extracted.get(duplicate_of[file_path])
+            if original:
+                documents.append((file_path, original[1], original[2]))
+        elif extracted.get(file_path):
+            documents.append(extracted[file_path])
     
     logger.info(f"Completed scanning. Found {len(documents)} documents.")
     return documents
 
 
+# Per-process settings for _process_file, set by _init_worker
+_known_hashes = frozenset()
+_hash_algorithm = DEFAULT_HASH_ALGORITHM
+_ocr_threads = OCR_MAX_THREADS
+
+
+def _init_worker(known_hashes: AbstractSet[str], hash_algorithm: str, ocr_threads: int,
+                 log_queue=None, log_level: int = logging.NOTSET):
+    """
+    Configure _process_file in this process.
+    
+    Args:
+        known_hashes: File hashes to skip extraction for
+        hash_algorithm: Algorithm to hash files with
+        ocr_threads: Pages of a single PDF to OCR concurrently
+        log_queue: Queue to send log records to the parent process through
+            (worker processes only)
+        log_level: Root logger level of the parent process
+    """
+    global _known_hashes, _hash_algorithm, _ocr_threads
+    _known_hashes = known_hashes
+    _hash_algorithm = hash_algorithm
+    _ocr_threads = ocr_threads
+    # Inherited by the Tesseract subprocesses pytesseract starts
+    os.environ['OMP_THREAD_LIMIT'] = TESSERACT_OMP_THREAD_LIMIT
+    
+    if log_queue is not None:
+        # Replace handlers inherited through fork so records are written once
+        root_logger = logging.getLogger()
+        root_logger.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+        root_logger.setLevel(log_level)
+
+
+def _process_file(file_path: str, file_hash: Optional[str] = None) -> Optional[Tuple[str, str, str]]:
+    """
+    Hash a single file and extract its text.
+    
+    Defined at module level so it can be dispatched to worker processes.
+    
+    Args:
+        file_path: Path to the file
+        file_hash: Hash of the file if already computed
+        
+    Returns:
+        Tuple of (filename, extracted_text, file_hash), with empty text if the
+        hash is already known, or None if the file was skipped
+    """
+    try:
+        logger.debug(f"Processing file: {file_path}")
+        
+        # Compute file hash
+        if not file_hash:
+            file_hash = compute_file_hash(file_path, _hash_algorithm)
+        if not file_hash:
+            logger.warning(f"Skipping file with empty hash: {file_path}")
+            return None
+        
+        if file_hash in _known_hashes:
+            logger.debug(f"Already processed, not extracting: {file_path}")
+            return (file_path, "", file_hash)
+        
+        # Extract text based on file type
+        extracted_text = extract_text_from_file(file_path)
+        
+        if extracted_text:
+            logger.info(f"Successfully processed: {Path(file_path).name}")
+            return (file_path, extracted_text, file_hash)
+        
+        logger.warning(f"No text extracted from: {Path(file_path).name}")
+        return None
+        
+    except Exception as e:
+        logger.error(f"Error processing {file_path}: {e}")
+        return None
+
+
 def extract_text_from_file(file_path: str) -> str:
     """
     Extract text from a file based on its type.
@@ -137,7 +433,7 @@ def extract_text_from_file(file_path: str) -> str:
             return extract_text_from_txt(file_path)
         elif extension == '.pdf':
             return extract_text_from_pdf(file_path)
-        elif extension in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff']:
+        elif extension in IMAGE_EXTENSIONS:
             return extract_text_from_image(file_path)
         else:
             logger.warning(f"Unsupported file type: {extension}")
@@ -158,15 +454,17 @@ def extract_text_from_txt(file_path: str) -> str:
         Text content
     """
     try:
-        # Try different encodings
-        encodings = ['utf-8', 'latin-1', 'cp1252']
+        # Read the bytes once and try each encoding on them in memory
+        with open(file_path, 'rb') as f:
+            data = f.read()
         
-        for encoding in encodings:
+        for encoding in TEXT_ENCODINGS:
             try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    return f.read()
+                text = data.decode(encoding)
             except UnicodeDecodeError:
                 continue
+            # Match text-mode reads: universal newlines
+            return text.replace('\r\n', '\n').replace('\r', '\n')
         
         logger.warning(f"Could not decode text file with common encodings: {file_path}")
         return ""
@@ -180,7 +478,9 @@ def extract_text_from_pdf(file_path: str) -> str:
     """
     Extract text from a PDF file.
     
-    First attempts to extract text directly, then falls back to OCR if needed.
+    First extracts the embedded text layer page by page. If the pages average
+    too little text, falls back to OCR for the pages whose embedded text is
+    missing or too short.
     
     Args:
         file_path: Path to the PDF file
@@ -188,44 +488,87 @@ def extract_text_from_pdf(file_path: str) -> str:
     Returns:
         Extracted text content
     """
-    text = ""
+    page_texts = []
     
     # Try to extract text directly from PDF first
     if PYPDF2_AVAILABLE:
         try:
             with open(file_path, 'rb') as f:
                 pdf_reader = PyPDF2.PdfReader(f)
-                for page in pdf_reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-            
-            # If we got substantial text, return it
-            if len(text.strip()) > MIN_TEXT_LENGTH_FOR_DIRECT_EXTRACTION:
-                logger.debug(f"Extracted text directly from PDF: {file_path}")
-                return text
+                page_texts = [page.extract_text() or "" for page in pdf_reader.pages]
         except Exception as e:
             logger.debug(f"Direct PDF text extraction failed: {e}")
+            page_texts = []
+    
+    # Mostly-text PDFs are returned as is, even with a blank or cover page
+    if page_texts:
+        average_length = sum(len(page_text.strip()) for page_text in page_texts) / len(page_texts)
+        if average_length >= MIN_PAGE_TEXT_LENGTH_FOR_DIRECT_EXTRACTION:
+            logger.debug(f"Extracted text directly from PDF: {file_path}")
+            return "".join(page_text + "\n" for page_text in page_texts if page_text)
+    
+    # Otherwise OCR only the pages without a usable text layer (all pages if unknown)
+    pages_to_ocr = [
+        i for i, page_text in enumerate(page_texts)
+        if len(page_text.strip()) < MIN_PAGE_TEXT_LENGTH_FOR_DIRECT_EXTRACTION
+    ]
     
-    # Fall back to OCR if direct extraction didn't work
     if PDF2IMAGE_AVAILABLE and PYTESSERACT_AVAILABLE:
         try:
-            logger.debug(f"Attempting OCR on PDF: {file_path}")
-            images = convert_from_path(file_path)
+            if not page_texts:
+                # No text layer to consult: OCR every page, still one page at a time
+                page_count = pdfinfo_from_path(file_path)["Pages"]
+                page_texts = [""] * page_count
+                pages_to_ocr = list(range(page_count))
             
-            ocr_text = ""
-            for i, image in enumerate(images):
-                logger.debug(f"Processing page {i+1}/{len(images)}")
-                page_text = pytesseract.image_to_string(image)
-                ocr_text += page_text + "\n"
-            
-            if ocr_text.strip():
-                return ocr_text
+            if pages_to_ocr:
+                logger.debug(f"Attempting OCR on {len(pages_to_ocr)}/{len(page_texts)} pages of PDF: {file_path}")
+                # Pages are rasterized on demand: at most _ocr_threads page images in memory
+                with ThreadPoolExecutor(max_workers=min(_ocr_threads, len(pages_to_ocr))) as executor:
+                    ocr_texts = list(executor.map(lambda i: _ocr_pdf_page(file_path, i + 1), pages_to_ocr))
+                for i, ocr_text in zip(pages_to_ocr, ocr_texts):
+                    if ocr_text.strip():
+                        page_texts[i] = ocr_text
                 
         except Exception as e:
             logger.error(f"OCR failed for PDF {file_path}: {e}")
     
-    return text
+    return "".join(page_text + "\n" for page_text in page_texts if page_text)
+
+
+def _ocr_pdf_page(file_path: str, page_number: int) -> str:
+    """
+    Rasterize and OCR a single PDF page.
+    
+    Args:
+        file_path: Path to the PDF file
+        page_number: 1-based page number
+        
+    Returns:
+        OCR'd text of the page
+    """
+    # Render straight to 8-bit grayscale instead of RGB
+    images = convert_from_path(file_path, first_page=page_number, last_page=page_number,
+                               dpi=PDF_OCR_DPI, grayscale=True)
+    return _ocr_image(images[0]) if images else ""
+
+
+def _ocr_image(image) -> str:
+    """
+    Run Tesseract on a PIL image.
+    
+    The image is converted to 8-bit grayscale first, since colour carries
+    no information for OCR and only inflates the data Tesseract processes.
+    
+    Args:
+        image: PIL image
+        
+    Returns:
+        OCR'd text
+    """
+    if image.mode != 'L':
+        image = image.convert('L')
+    return pytesseract.image_to_string(image, config=TESSERACT_CONFIG)
 
 
 def extract_text_from_image(file_path: str) -> str:
@@ -243,9 +586,8 @@ def extract_text_from_image(file_path: str) -> str:
         return ""
     
     try:
-        image = Image.open(file_path)
-        text = pytesseract.image_to_string(image)
-        return text
+        with Image.open(file_path) as image:
+            return _ocr_image(image)
     except Exception as e:
         logger.error(f"OCR failed for image {file_path}: {e}")
         return ""